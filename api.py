@@ -1,87 +1,294 @@
 import streamlit as st
+import os
+import re
 import requests
-import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+import lxml.etree as ET
+import numpy as np
 import pandas as pd
-import time
 import datetime
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import diskcache
 import folium
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster
+from geopy.adapters import RequestsAdapter
+from geopy.extra.rate_limiter import RateLimiter
 from geopy.geocoders import Nominatim
 import altair as alt
+from streamlit_folium import st_folium
 
-@st.cache_data(show_spinner=False)
+# 카카오 로컬 API REST 키 (설정되지 않은 경우 Nominatim만 사용)
+KAKAO_API_KEY = os.environ.get("KAKAO_REST_API_KEY", "")
+KAKAO_ADDRESS_URL = "https://dapi.kakao.com/v2/local/search/address.json"
+# 서울시 열린데이터 API 1회 호출당 최대 조회 행 수
+API_PAGE_SIZE = 1000
+# 한 번의 조회에서 허용하는 최대 행 수 (API_PAGE_SIZE 단위로 나누어 병렬 조회)
+MAX_QUERY_ROWS = 5000
+# API 응답의 <row> 자식 태그 -> 결과 컬럼명 (컬럼 순서도 이 순서를 따름)
+TAG_MAP = {
+    'RCPT_YR': "접수연도",
+    'CGG_NM': "자치구명",
+    'STDG_NM': "법정동명",
+    'MNO': "본번",
+    'SNO': "부번",
+    'BLDG_NM': "건물명",
+    'CTRT_DAY': "계약일",
+    'THING_AMT': "물건금액(만원)",
+    'ARCH_AREA': "건물면적(㎡)"
+}
+# 지오코딩 결과 캐시 유지 기간 (30일, 초 단위)
+GEOCODE_TTL = 30 * 24 * 60 * 60
+# 위치를 찾지 못한 주소의 캐시 유지 기간 (1일, 초 단위)
+GEOCODE_NOT_FOUND_TTL = 24 * 60 * 60
+# 서버 재시작 후에도 유지되는 지오코딩 디스크 캐시 경로
+GEOCODE_CACHE_DIR = ".cache/geocode"
+# 차트 스펙 생성(Chart.to_dict) 시 st.altair_chart와 마찬가지로 Altair의 기본 5000행 제한을 두지 않습니다.
+# 프로세스 전역 설정이므로, 동시에 실행되는 세션 간 경합이 없도록 블록 단위로 켜고 끄지 않고 전역으로 한 번 적용합니다.
+alt.data_transformers.disable_max_rows()
+# 브라우저에서 마커를 생성하는 FastMarkerCluster 콜백 (row = [위도, 경도, 툴팁, 팝업 HTML])
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindTooltip(row[2]);
+    marker.bindPopup(row[3]);
+    return marker;
+}"""
+
+@st.cache_resource(show_spinner=False)
+def get_cache_counters():
+    """
+    캐시 적중/미스 횟수를 집계하는 카운터와 잠금을 서버 프로세스당 한 번만 생성합니다.
+    """
+    return collections.Counter(), threading.Lock()
+
+def count_cache_event(key, n=1):
+    """
+    캐시 이벤트 카운터를 증가시킵니다. (지오코딩 스레드에서도 호출됨)
+    """
+    counters, lock = get_cache_counters()
+    with lock:
+        counters[key] += n
+
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    """
+    연결을 재사용(keep-alive)하는 requests.Session을 한 번만 생성합니다.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+@st.cache_resource(show_spinner=False)
+def get_geocoder():
+    """
+    세션(requests.Session)을 재사용하는 Nominatim 지오코더를 한 번만 생성합니다.
+    Nominatim 사용 정책에 따라 스레드 간에도 요청 간 최소 1초 딜레이를 적용합니다.
+    """
+    geolocator = Nominatim(user_agent="seoul_real_estate_app", adapter_factory=RequestsAdapter)
+    # 재시도 후에도 실패하면 예외를 전달하여 '결과 없음'과 구분되도록 합니다.
+    return RateLimiter(geolocator.geocode, min_delay_seconds=1, swallow_exceptions=False)
+
+@st.cache_resource(show_spinner=False)
+def get_geocode_cache():
+    """
+    지오코딩 결과를 저장하는 디스크 캐시를 한 번만 엽니다.
+    """
+    return diskcache.Cache(GEOCODE_CACHE_DIR)
+
+def normalize_address(address):
+    """
+    캐시 적중률을 높이기 위해 주소의 공백을 정리하고,
+    번지의 앞자리 0과 0인 부번(예: '0012-0000' -> '12')을 제거합니다.
+    """
+    address = " ".join(address.split())
+    address = re.sub(r"\b0+(\d)", r"\1", address)
+    return re.sub(r"-0$", "", address)
+
+def kakao_coordinates(address):
+    """
+    카카오 로컬 API로 주소를 위도/경도로 변환합니다.
+    API 키가 없거나 검색 결과가 없으면 None을 반환합니다.
+    """
+    if not KAKAO_API_KEY:
+        return None
+    response = get_http_session().get(
+        KAKAO_ADDRESS_URL,
+        params={"query": address},
+        headers={"Authorization": f"KakaoAK {KAKAO_API_KEY}"},
+        timeout=5
+    )
+    response.raise_for_status()
+    documents = response.json().get("documents")
+    if documents:
+        return (float(documents[0]["y"]), float(documents[0]["x"]))
+    return None
+
+# 메모리 캐시는 '위치 없음' 결과가 디스크 캐시보다 오래 남지 않도록 짧은 유지 기간을 사용합니다.
+# (성공 결과는 만료 후에도 디스크 캐시에서 바로 다시 읽어옵니다.)
+@st.cache_data(ttl=GEOCODE_NOT_FOUND_TTL, show_spinner=False)
 def get_coordinates(address):
     """
-    geopy의 Nominatim을 사용해 주소를 위도/경도로 변환합니다.
+    한국 주소 정확도가 높은 카카오 로컬 API를 우선 사용하고,
+    결과가 없거나 카카오 API 호출이 실패한 주소만 geopy의 Nominatim으로 위도/경도를 조회합니다.
+    조회 결과는 디스크 캐시에 저장하여 서버 재시작 후에도 재사용하며,
+    위치를 찾지 못한 주소는 None으로 더 짧은 기간 동안 캐시합니다.
+    지오코딩 서비스 오류는 예외로 전달하여 캐시되지 않도록 합니다.
     """
-    geolocator = Nominatim(user_agent="seoul_real_estate_app")
+    address = normalize_address(address)
+    cache = get_geocode_cache()
+    # 저장된 None('위치 없음')과 구분하기 위해 캐시에 없으면 False를 반환받습니다.
+    coords = cache.get(address, default=False)
+    if coords is not False:
+        count_cache_event('geocode_disk_hit')
+        return coords
+    count_cache_event('geocode_miss')
+    kakao_error = None
     try:
-        location = geolocator.geocode(address)
-        # Nominatim 사용 정책에 따라 요청 간 딜레이 적용
-        time.sleep(1)
+        coords = kakao_coordinates(address)
+    except requests.RequestException as e:
+        # 키 오류, 할당량 초과, 타임아웃 등 카카오 API 오류 시 Nominatim으로 대체합니다.
+        kakao_error = e
+        coords = None
+    if not coords:
+        location = get_geocoder()(address)
         if location:
-            return (location.latitude, location.longitude)
+            coords = (location.latitude, location.longitude)
+        elif kakao_error is not None:
+            # 카카오 오류로 확인하지 못한 주소는 '위치 없음'으로 캐시하지 않습니다.
+            raise kakao_error
+        else:
+            cache.set(address, None, expire=GEOCODE_NOT_FOUND_TTL)
+            return None
+    cache.set(address, coords, expire=GEOCODE_TTL)
+    return coords
+
+def lookup_coordinates(address):
+    """
+    get_coordinates를 호출하여 (좌표 또는 None, 오류 메시지 또는 None) 튜플을 반환합니다.
+    작업 스레드에서는 st.error가 표시되지 않으므로 오류 메시지는 호출한 쪽에서 표시합니다.
+    """
+    try:
+        return get_coordinates(address), None
     except Exception as e:
-        st.error(f"Geocoding error for {address}: {e}")
-    return None
+        return None, f"Geocoding error for {address}: {e}"
 
-def query_real_estate(api_key, district, dong, start=1, end=1000):
+def geocode_addresses(addresses):
+    """
+    주소 목록의 중복을 제거한 뒤 병렬로 지오코딩하여
+    ({주소: (위도, 경도) 또는 None} 딕셔너리, 오류 메시지 목록)을 반환합니다.
+    """
+    unique_addresses = list(dict.fromkeys(addresses))
+    count_cache_event('geocode_lookup', len(unique_addresses))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lookup_coordinates, unique_addresses))
+    coord_map = {address: coords for address, (coords, _) in zip(unique_addresses, results)}
+    errors = [error for _, error in results if error]
+    return coord_map, errors
+
+def parse_number(text, cast=float):
     """
-    서울시 부동산 실거래가 API에서 XML 데이터를 가져와,
+    숫자 문자열을 변환하고, 비어 있거나 잘못된 값은 NaN으로 처리합니다.
+    """
+    try:
+        return cast(text)
+    except ValueError:
+        return np.nan
+
+def parse_date(text):
+    """
+    YYYYMMDD 형식의 문자열을 datetime으로 변환하고, 잘못된 값은 NaT로 처리합니다.
+    """
+    if len(text) != 8:
+        return pd.NaT
+    try:
+        return datetime.datetime(int(text[:4]), int(text[4:6]), int(text[6:8]))
+    except ValueError:
+        return pd.NaT
+
+def fetch_chunk(api_key, district, dong, start, end):
+    """
+    서울시 부동산 실거래가 API에서 start~end 행(최대 1000행)의 XML 데이터를 가져와,
     자치구(필수)와 (법정동이 입력된 경우) 법정동이 포함된 행만 필터링하여 반환합니다.
     """
     base_url = f"http://openapi.seoul.go.kr:8088/{api_key}/xml/tbLnOpendataRtmsV/{start}/{end}"
-    try:
-        response = requests.get(base_url)
+    response = get_http_session().get(
+        base_url, stream=True, headers={'Accept-Encoding': 'gzip'}, timeout=10
+    )
+    filtered_results = []
+    # 오류 응답도 with 블록 안에서 처리하여 스트리밍 연결이 항상 풀로 반환되도록 합니다.
+    with response:
         response.raise_for_status()
-    except Exception as e:
-        st.error(f"API 호출 실패: {e}")
-        return []
-    
-    root = ET.fromstring(response.content)
-    rows = root.findall('.//row')
+        # 응답을 내려받는 동안 gzip 해제와 <row> 단위 스트리밍 파싱을 함께 진행합니다.
+        response.raw.decode_content = True
+        for _, row in ET.iterparse(response.raw, tag='row'):
+            # 자식 태그를 한 번만 순회하며 필요한 태그만 컬럼명으로 매핑합니다.
+            data = dict.fromkeys(TAG_MAP.values(), "")
+            for child in row:
+                key = TAG_MAP.get(child.tag)
+                if key:
+                    data[key] = child.text or ""
+            # 자치구는 필수이며, 법정동은 입력된 경우에만 필터링합니다.
+            if district in data["자치구명"] and (not dong or dong in data["법정동명"]):
+                # 파싱 시점에 타입을 변환해 DataFrame 생성 후 재변환을 생략합니다.
+                data["계약일"] = parse_date(data["계약일"])
+                data["물건금액(만원)"] = parse_number(data["물건금액(만원)"], int)
+                data["건물면적(㎡)"] = parse_number(data["건물면적(㎡)"])
+                filtered_results.append(data)
+            # 처리가 끝난 행과 앞선 형제 노드를 해제합니다.
+            row.clear()
+            while row.getprevious() is not None:
+                del row.getparent()[0]
     
+    return filtered_results
+
+def query_real_estate(api_key, district, dong, start=1, end=1000):
+    """
+    서울시 부동산 실거래가 API에서 start~end 행을 조회해 필터링된 결과를 반환합니다.
+    API는 한 번에 1000행까지만 반환하므로, 범위가 더 크면 1000행 단위로 나누어 병렬로 조회합니다.
+    API 호출 실패 시 예외를 그대로 전달합니다. (캐시는 load_and_convert에서 담당)
+    """
+    # load_and_convert 캐시 미스일 때만 호출되므로 실제 API 조회 횟수로 집계합니다.
+    count_cache_event('query_miss')
+    if end - start + 1 <= API_PAGE_SIZE:
+        return fetch_chunk(api_key, district, dong, start, end)
+    ranges = [(first, min(first + API_PAGE_SIZE - 1, end)) for first in range(start, end + 1, API_PAGE_SIZE)]
     filtered_results = []
-    for row in rows:
-        cgg_nm = row.find('CGG_NM').text if row.find('CGG_NM') is not None else ""
-        stdg_nm = row.find('STDG_NM').text if row.find('STDG_NM') is not None else ""
-        # 자치구는 필수이며, 법정동은 입력된 경우에만 필터링합니다.
-        if district in cgg_nm and (not dong or dong in stdg_nm):
-            data = {
-                "접수연도": row.find('RCPT_YR').text if row.find('RCPT_YR') is not None else "",
-                "자치구명": cgg_nm,
-                "법정동명": stdg_nm,
-                "본번": row.find("MNO").text if row.find("MNO") is not None else "",
-                "부번": row.find("SNO").text if row.find("SNO") is not None else "",
-                "건물명": row.find('BLDG_NM').text if row.find('BLDG_NM') is not None else "",
-                "계약일": row.find('CTRT_DAY').text if row.find('CTRT_DAY') is not None else "",
-                "물건금액(만원)": row.find('THING_AMT').text if row.find('THING_AMT') is not None else "",
-                "건물면적(㎡)": row.find('ARCH_AREA').text if row.find('ARCH_AREA') is not None else ""
-            }
-            filtered_results.append(data)
-    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for rows in executor.map(lambda r: fetch_chunk(api_key, district, dong, *r), ranges):
+            filtered_results.extend(rows)
     return filtered_results
 
 def convert_data(results):
     """
     리스트 형태의 결과를 DataFrame으로 변환하고,
-    계약일을 datetime, 물건금액 및 건물면적을 숫자로 변환한 후,
+    (계약일, 물건금액, 건물면적은 조회 시점에 이미 변환되어 있음)
     단가(만원/㎡)를 계산하여 새로운 컬럼으로 추가합니다.
     """
     df = pd.DataFrame(results)
     if df.empty:
         return df
-    # 계약일: YYYYMMDD 형식을 datetime으로 변환
-    df['계약일'] = pd.to_datetime(df['계약일'], format='%Y%m%d', errors='coerce')
-    # 물건금액과 건물면적을 숫자로 변환
-    df['물건금액(만원)'] = pd.to_numeric(df['물건금액(만원)'], errors='coerce')
-    df['건물면적(㎡)'] = pd.to_numeric(df['건물면적(㎡)'], errors='coerce')
-    # 단가(만원/㎡) 계산
-    df['단가(만원/㎡)'] = df.apply(
-        lambda row: row['물건금액(만원)'] / row['건물면적(㎡)']
-        if row['건물면적(㎡)'] and row['건물면적(㎡)'] > 0 else None, axis=1)
+    # 단가(만원/㎡) 계산: 건물면적이 유효(양수)한 행만 나누고 나머지는 NaN
+    area = df['건물면적(㎡)'].to_numpy(dtype=float)
+    price = df['물건금액(만원)'].to_numpy(dtype=float)
+    mask = np.isfinite(area) & (area > 0)
+    unit_price = np.full(area.shape, np.nan)
+    np.divide(price, area, out=unit_price, where=mask)
+    df['단가(만원/㎡)'] = unit_price
     return df
 
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_and_convert(_api_key, district, dong, start=1, end=1000):
+    """
+    실거래 데이터를 조회해 DataFrame으로 변환한 결과를 캐시합니다.
+    API 호출 실패 시 예외는 캐시되지 않으므로 다음 조회에서 다시 시도합니다.
+    반환된 DataFrame은 재실행 간에 공유되므로, 수정이 필요하면 .copy() 후 사용합니다.
+    """
+    return convert_data(query_real_estate(_api_key, district, dong, start, end))
+
 def download_button(df):
     """
     DataFrame을 CSV 파일로 변환해 다운로드할 수 있는 버튼 생성.
@@ -94,6 +301,33 @@ def download_button(df):
         mime="text/csv"
     )
 
+@st.cache_data(show_spinner=False)
+def build_trend_chart(df_group):
+    """
+    월별 평균 단가 추이 선 그래프를 Vega-Lite 스펙(dict)으로 생성합니다.
+    """
+    line_chart = alt.Chart(df_group).mark_line(point=True).encode(
+        x=alt.X('년월:T', title="계약일(월)"),
+        y=alt.Y('단가(만원/㎡):Q', title="평당가(만원/㎡)")
+    ).properties(width=700, height=400)
+    return line_chart.to_dict()
+
+@st.cache_data(show_spinner=False)
+def build_area_price_charts(df_analysis):
+    """
+    단가 분포 히스토그램과 건물면적 대비 단가 산점도를 Vega-Lite 스펙(dict)으로 생성합니다.
+    """
+    hist = alt.Chart(df_analysis).mark_bar().encode(
+        alt.X('단가(만원/㎡):Q', bin=alt.Bin(maxbins=30), title="단가(만원/㎡)"),
+        alt.Y('count()', title="거래 건수")
+    ).properties(width=350, height=300)
+    scatter = alt.Chart(df_analysis).mark_circle(size=60).encode(
+        x=alt.X('건물면적(㎡):Q', title="건물면적(㎡)"),
+        y=alt.Y('단가(만원/㎡):Q', title="단가(만원/㎡)"),
+        tooltip=['건물명', '물건금액(만원)', '건물면적(㎡)', '단가(만원/㎡)']
+    ).properties(width=350, height=300)
+    return hist.to_dict(), scatter.to_dict()
+
 def main():
     st.title("서울시 부동산 실거래가 조회 & 분석")
     
@@ -110,14 +344,24 @@ def main():
         if not district:
             st.warning("자치구명을 입력하세요.")
             return
+        if end < start:
+            st.warning("종료 행 번호는 시작 행 번호보다 크거나 같아야 합니다.")
+            return
+        if end - start + 1 > MAX_QUERY_ROWS:
+            st.warning(f"한 번에 최대 {MAX_QUERY_ROWS:,}행까지 조회할 수 있습니다. 행 번호 범위를 줄여주세요.")
+            return
         
         with st.spinner("실거래 데이터를 조회중입니다..."):
-            results = query_real_estate(real_estate_api_key, district, dong, start, end)
-        if not results:
+            count_cache_event('query_lookup')
+            try:
+                df = load_and_convert(real_estate_api_key, district, dong, start, end)
+            except Exception as e:
+                st.error(f"API 호출 실패: {e}")
+                df = pd.DataFrame()
+        if df.empty:
             st.info("해당 조건의 실거래 데이터가 없습니다.")
             return
         
-        df = convert_data(results)
         st.subheader("실거래가 조회 결과")
         st.dataframe(df)
         download_button(df)
@@ -135,52 +379,47 @@ def main():
         st.subheader("요약 지표")
         kpi1, kpi2, kpi3 = st.columns(3)
         total_count = len(df)
-        avg_price = df['물건금액(만원)'].mean() if not df['물건금액(만원)'].empty else 0
-        avg_unit_price = df['단가(만원/㎡)'].mean() if not df['단가(만원/㎡)'].empty else 0
+        # 두 컬럼의 평균을 한 번에 계산하고, 값이 없으면(NaN) 0으로 표시합니다.
+        stats = df[['물건금액(만원)', '단가(만원/㎡)']].agg(['mean']).fillna(0)
+        avg_price = stats.at['mean', '물건금액(만원)']
+        avg_unit_price = stats.at['mean', '단가(만원/㎡)']
         kpi1.metric(label="총 거래 건수", value=f"{total_count:,}")
         kpi2.metric(label="평균 거래가(만원)", value=f"{avg_price:,.0f}만원")
         kpi3.metric(label="평균 단가(만원/㎡)", value=f"{avg_unit_price:,.2f}만원/㎡")
         
         # 1. 거래 추이 분석 (월별 평균 평당가 변화)
         st.subheader("거래 추이 분석 (월별 평당가 변화)")
-        df_time = df.dropna(subset=['계약일', '단가(만원/㎡)']).copy()
+        df_time = df.dropna(subset=['계약일', '단가(만원/㎡)'])
         if not df_time.empty:
-            df_time['년월'] = df_time['계약일'].dt.to_period('M').dt.to_timestamp()
-            df_group = df_time.groupby('년월')['단가(만원/㎡)'].mean().reset_index()
-            line_chart = alt.Chart(df_group).mark_line(point=True).encode(
-                x=alt.X('년월:T', title="계약일(월)"),
-                y=alt.Y('단가(만원/㎡):Q', title="평당가(만원/㎡)")
-            ).properties(width=700, height=400)
-            st.altair_chart(line_chart, use_container_width=True)
+            # 월초(MS) 기준으로 리샘플링하고, 거래가 없는 달은 제외합니다.
+            df_group = (
+                df_time.set_index('계약일')['단가(만원/㎡)']
+                .resample('MS').mean().dropna()
+                .reset_index().rename(columns={'계약일': '년월'})
+            )
+            st.vega_lite_chart(build_trend_chart(df_group), use_container_width=True)
         else:
             st.info("계약일 및 단가 정보가 부족하여 거래 추이 분석을 수행할 수 없습니다.")
         
         # 2. 건물면적 대비 가격 분석 (단가 분포 & 산점도)
         st.subheader("건물면적 대비 가격 분석")
-        df_analysis = df.dropna(subset=['단가(만원/㎡)', '건물면적(㎡)']).copy()
+        # 차트에 필요한 컬럼만 남겨 캐시 키 해싱과 스펙 직렬화 비용을 줄입니다.
+        df_analysis = df.dropna(subset=['단가(만원/㎡)', '건물면적(㎡)'])[
+            ['건물명', '물건금액(만원)', '건물면적(㎡)', '단가(만원/㎡)']
+        ]
         if not df_analysis.empty:
-            hist = alt.Chart(df_analysis).mark_bar().encode(
-                alt.X('단가(만원/㎡):Q', bin=alt.Bin(maxbins=30), title="단가(만원/㎡)"),
-                alt.Y('count()', title="거래 건수")
-            ).properties(width=350, height=300)
-            scatter = alt.Chart(df_analysis).mark_circle(size=60).encode(
-                x=alt.X('건물면적(㎡):Q', title="건물면적(㎡)"),
-                y=alt.Y('단가(만원/㎡):Q', title="단가(만원/㎡)"),
-                tooltip=['건물명', '물건금액(만원)', '건물면적(㎡)', '단가(만원/㎡)']
-            ).properties(width=350, height=300)
+            hist_spec, scatter_spec = build_area_price_charts(df_analysis)
             col1, col2 = st.columns(2)
             with col1:
-                st.altair_chart(hist, use_container_width=True)
+                st.vega_lite_chart(hist_spec, use_container_width=True)
             with col2:
-                st.altair_chart(scatter, use_container_width=True)
+                st.vega_lite_chart(scatter_spec, use_container_width=True)
         else:
             st.info("분석할 수 있는 단가 및 건물면적 데이터가 부족합니다.")
         
         # 3. 상위 거래 TOP 5 하이라이트 (거래금액 기준)
         st.subheader("상위 거래 TOP 5 하이라이트")
-        df_top5 = df.dropna(subset=['물건금액(만원)']).copy()
-        df_top5['물건금액(만원)'] = pd.to_numeric(df_top5['물건금액(만원)'], errors='coerce')
-        top5 = df_top5.nlargest(5, '물건금액(만원)')
+        top5 = df.dropna(subset=['물건금액(만원)']).nlargest(5, '물건금액(만원)')
         if not top5.empty:
             cols = st.columns(5)
             for idx, (_, row) in enumerate(top5.iterrows()):
@@ -193,47 +432,70 @@ def main():
         else:
             st.info("상위 거래 데이터를 찾을 수 없습니다.")
         
-        # 4. 지도 시각화: Folium의 MarkerCluster 활용
+        # 4. 지도 시각화: Folium의 FastMarkerCluster 활용
         st.subheader("거래 위치 지도")
         with st.spinner("지도 데이터를 조회중입니다..."): 
-            map_data = []
-            for idx, row in df.iterrows():
-                if row['본번']:
-                    if row['부번'] in ['0000', '', None]:
-                        address = f"서울특별시 {row['자치구명']} {row['법정동명']} {row['본번']}"
-                    else:
-                        address = f"서울특별시 {row['자치구명']} {row['법정동명']} {row['본번']}-{row['부번']}"
-                    coords = get_coordinates(address)
-                    if coords:
-                        map_data.append({
-                            "lat": coords[0],
-                            "lon": coords[1],
-                            "건물명": row['건물명'],
-                            "주소": address,
-                            "물건금액(만원)": row['물건금액(만원)'],
-                            "단가(만원/㎡)": row['단가(만원/㎡)']
-                        })
+            # 같은 건물(자치구/법정동/본번/부번)은 주소 조립과 지오코딩을 한 번만 수행한 뒤 거래 행에 다시 연결합니다.
+            key_cols = ['자치구명', '법정동명', '본번', '부번']
+            sub = df[df['본번'].astype(bool)]
+            buildings = sub[key_cols].drop_duplicates()
+            sep = np.where(buildings['부번'].isin(['0000', '']) | buildings['부번'].isna(), '', '-' + buildings['부번'].astype(str))
+            buildings['주소'] = '서울특별시 ' + buildings['자치구명'] + ' ' + buildings['법정동명'] + ' ' + buildings['본번'].astype(str) + sep
+            coord_map, geocode_errors = geocode_addresses(buildings['주소'].tolist())
+            for message in geocode_errors:
+                st.error(message)
+            coords = buildings['주소'].map(coord_map).dropna()
+            buildings = buildings.loc[coords.index].assign(
+                lat=[c[0] for c in coords],
+                lon=[c[1] for c in coords]
+            )
+            located = sub.merge(buildings, on=key_cols)
+            map_data = located[['lat', 'lon', '건물명', '주소', '물건금액(만원)', '단가(만원/㎡)']].to_dict('records')
             if map_data:
-                avg_lat = sum([d["lat"] for d in map_data]) / len(map_data)
-                avg_lon = sum([d["lon"] for d in map_data]) / len(map_data)
+                avg_lat = float(located['lat'].mean())
+                avg_lon = float(located['lon'].mean())
                 m = folium.Map(location=[avg_lat, avg_lon], zoom_start=12)
-                marker_cluster = MarkerCluster().add_to(m)
+                # 마커는 브라우저에서 생성하도록 [위도, 경도, 툴팁, 팝업] 배열만 전달합니다.
+                marker_rows = []
                 for d in map_data:
                     popup_html = (
                         f"<b>{d['건물명']}</b><br>"
                         f"주소: {d['주소']}<br>"
-                        f"거래가: {int(d['물건금액(만원)']) if d['물건금액(만원)'] else 'N/A'}만원<br>"
-                        f"단가: {round(d['단가(만원/㎡)'], 2) if d['단가(만원/㎡)'] else 'N/A'}만원/㎡"
+                        f"거래가: {int(d['물건금액(만원)']) if pd.notnull(d['물건금액(만원)']) else 'N/A'}만원<br>"
+                        f"단가: {round(d['단가(만원/㎡)'], 2) if pd.notnull(d['단가(만원/㎡)']) else 'N/A'}만원/㎡"
                     )
-                    folium.Marker(
-                        location=[d["lat"], d["lon"]],
-                        tooltip=d["건물명"] if d["건물명"] else "건물명 없음",
-                        popup=popup_html
-                    ).add_to(marker_cluster)
+                    tooltip = d["건물명"] if d["건물명"] else "건물명 없음"
+                    marker_rows.append([d["lat"], d["lon"], tooltip, popup_html])
+                FastMarkerCluster(marker_rows, callback=MARKER_CALLBACK).add_to(m)
             
-                st.components.v1.html(m._repr_html_(), height=500)
+                # returned_objects=[]: 지도 상태를 Streamlit으로 되돌려 보내지 않아 불필요한 재실행을 막습니다.
+                st_folium(m, height=500, use_container_width=True, returned_objects=[])
             else:
                 st.info("지도에 표시할 위치 데이터가 없습니다.")
 
+def show_cache_stats():
+    """
+    지오코딩과 실거래 조회의 캐시 적중/미스 횟수를 사이드바에 표시합니다.
+    """
+    counters, lock = get_cache_counters()
+    with lock:
+        counts = dict(counters)
+    geocode_lookup = counts.get('geocode_lookup', 0)
+    geocode_miss = counts.get('geocode_miss', 0)
+    query_lookup = counts.get('query_lookup', 0)
+    query_miss = counts.get('query_miss', 0)
+    with st.sidebar.expander("캐시 통계"):
+        st.json({
+            # 메모리 캐시 또는 디스크 캐시에서 응답한 주소 수
+            "geocode_hit": geocode_lookup - geocode_miss,
+            "geocode_disk_hit": counts.get('geocode_disk_hit', 0),
+            # 카카오/Nominatim을 실제로 호출한 주소 수
+            "geocode_miss": geocode_miss,
+            "query_hit": query_lookup - query_miss,
+            # 서울시 API를 실제로 호출한 조회 수
+            "query_miss": query_miss
+        })
+
 if __name__ == "__main__":
     main()
+    show_cache_stats()